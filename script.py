@@ -1,15 +1,18 @@
 import os
 import pandas as pd
-from pypdf import PdfReader
+import fitz  # PyMuPDF
 import re
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Set
+from typing import Iterator, List, Dict, Optional, Set
 import logging
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain, islice
 
-# Configure logging with more detailed format
+# Configure logging with more detailed format (set LOG_LEVEL=DEBUG for per-line tracing)
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
         logging.FileHandler('process.log'),
@@ -18,11 +21,101 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Checked once so the per-line hot paths skip building debug messages entirely
+_DEBUG = logger.isEnabledFor(logging.DEBUG)
+
+# Precompiled patterns used on every line of every PDF
+
+# Lines that are likely headers or footers, as one alternation
+_SKIP_RE = re.compile(
+    r'Generated on|Page \d+ of|This is acknowledgement|Made By|TOTAL WEIGHT|Unloading point',
+    re.IGNORECASE
+)
+
+# Specific valve code patterns, fused into one alternation with a named group per
+# format. It is wrapped in a lookahead so that, like separate scans per format,
+# codes of different formats may overlap (e.g. a product code inside a CH code).
+_CODE_RE = re.compile(
+    r'(?=(?:'
+    # Product codes from SO
+    r'(?P<product>\b9[0-9]{6}\b)'
+    # DP/DPCV format codes
+    r'|(?P<dp_full>(?:DP|DPCV)\s*\d{4}\s*MM\s*#\d{2,4}\s*M-\d+[A-Z]?)'
+    r'|(?P<dp_technical>DP\d{2}\.[A-Z0-9]+\.\d{2}\.[A-Z]{2}\.\d+[A-Z]?)'
+    # CH format codes from PO (CH-XXXX [MR]) and CHL/CHS/CHH-XXXX
+    r'|(?P<ch>CH(?P<ch_series>[LHS]?)-(?P<ch_number>\d{4})(?P<ch_mr>\s+MR)?)'
+    r'))',
+    re.IGNORECASE
+)
+
+# Codes identified by a preceding label, which need their own anchors
+_LABELLED_CODE_RE = re.compile(
+    # Marc codes
+    r'(?P<marc>(?<=Marc code:\s)\d+)'
+    # Standalone valve numbers
+    r'|(?P<item_no>(?<=Item No\.\s)\d{3,4}(?=\s))',
+    re.IGNORECASE
+)
+
+_CODE_TYPES = {
+    'product': 'Product Code',
+    'dp_full': 'DPCV/DP Full Format',
+    'dp_technical': 'DP Technical Format',
+    'ch': 'CH Format',
+    'marc': 'Marc Code',
+    'item_no': 'Item Number'
+}
+
+# More specific quantity and price patterns, each paired with the uppercase literals
+# a line must contain for it to match (None = always try). The substring tests are
+# far cheaper than running the regex on lines that cannot match.
+_QTY_PATTERNS = [
+    (('QTY',), re.compile(r'QTY\s*[:=]?\s*(\d+)', re.IGNORECASE)),                    # QTY: 123
+    (('QUANTITY',), re.compile(r'Quantity\s*[:=]?\s*(\d+)', re.IGNORECASE)),          # Quantity: 123
+    (('NOS', 'PCS', 'PIECES', 'EA', 'NR'),
+     re.compile(r'\s(\d+)\s*(?:NOS|PCS|PIECES|EA|NR)', re.IGNORECASE)),                # 123 NOS or 123 PCS
+    (None, re.compile(r'^\s*(\d+)\s*$', re.IGNORECASE)),                                # Standalone number at start
+    (('QUANTITY',), re.compile(r'Quantity\s+(\d+)\s+UM', re.IGNORECASE)),             # From PO format
+    (('NR', 'EA'), re.compile(r'(?<=\s)(\d+)(?=\s+(?:NR|EA))', re.IGNORECASE)),       # Number before NR/EA
+    (('USD',), re.compile(r'(?<=\s)(\d+)(?=\s+(?:USD|USD\s+))', re.IGNORECASE))      # Number before USD
+]
+
+_PRICE_PATTERNS = [
+    (('USD',), re.compile(r'USD\s*([\d,]+(?:\.\d{2})?)', re.IGNORECASE)),            # USD 123.45
+    (('$',), re.compile(r'\$\s*([\d,]+(?:\.\d{2})?)', re.IGNORECASE)),               # $ 123.45
+    (('PRICE',), re.compile(r'(?:Price|PRICE)[:\s]*([\d,]+(?:\.\d{2})?)', re.IGNORECASE)),  # Price: 123.45
+    (('PRICE',),
+     re.compile(r'(?:Unit Price|UNIT PRICE)[:\s]*([\d,]+(?:\.\d{2})?)', re.IGNORECASE)),  # Unit Price: 123.45
+    (('USD',), re.compile(r'(?<=\s)([\d,]+\.\d{2})(?=\s+USD)', re.IGNORECASE)),      # 123.45 USD
+    (('USD',), re.compile(r'Amount\s+USD\s+([\d,]+\.\d{2})', re.IGNORECASE)),        # Amount USD 123.45
+    (('.',), re.compile(r'(?<=[A-Z])\s+([\d,]+\.\d{2})\s*$', re.IGNORECASE))         # Price at end of line after text
+]
+
+_WS_RE = re.compile(r'\s+')
+_LETNUM_RE = re.compile(r'(?<=[a-zA-Z])(?=\d)')
+_MARC_RE = re.compile(r'Marc code:\s*(\d+)')
+_LINENO_RE = re.compile(r'^\s*(\d+)')
+_MAT_RE = re.compile(r'\(([^)]+)\)')
+_NUM4_RE = re.compile(r'\d{4}')
+_DIGIT_RE = re.compile(r'\d')
+
+# Number of leading lines used for content-based document type detection
+DOC_TYPE_HEAD_LINES = 100
+
+# Max vertical distance (points) between words on the same PyMuPDF text line
+_LINE_TOLERANCE = 2.0
+
+# normalize_code patterns
+_NORM_D_SUFFIX_RE = re.compile(r'\[D\]$')
+_NORM_MR_SUFFIX_RE = re.compile(r'MR$')
+_NORM_PREFIX_RE = re.compile(r'^\s*(?:VALVE|CHECK)\s+')
+
+@dataclass(slots=True)
 class ValveItem:
     """Represents a valve item with all possible identifiers"""
     line_number: str = ""
     item_codes: Set[str] = field(default_factory=set)
+    mapped_codes: Set[str] = field(default_factory=set)  # ERP counterparts of item_codes and their normalized forms
     description: str = ""
     quantity: str = "1"
     material_spec: str = ""
@@ -48,27 +141,31 @@ class DocumentProcessor:
     def load_erp_codes(self):
         """Load and process ERP codes from Excel with improved error handling"""
         try:
-            df = pd.read_excel(self.excel_path)
             required_columns = {'acode', 'cpartno'}
+            df = pd.read_excel(self.excel_path, usecols=lambda col: col in required_columns, dtype=str)
             if not all(col in df.columns for col in required_columns):
                 raise ValueError(f"Excel file must contain columns: {required_columns}")
 
-            # Clean and process codes
-            for _, row in df.iterrows():
-                acode = str(row['acode']).strip()
-                cpartno = str(row['cpartno']).strip()
-                
-                # Skip empty or invalid codes
-                if not acode or not cpartno or acode.lower() == 'nan' or cpartno.lower() == 'nan':
-                    continue
-                    
+            # Clean codes column-wise instead of boxing every row into a Series
+            acodes = df['acode'].str.strip()
+            cpartnos = df['cpartno'].str.strip()
+
+            # Skip empty or invalid codes
+            valid = (
+                acodes.notna() & cpartnos.notna()
+                & (acodes.str.lower() != 'nan') & (cpartnos.str.lower() != 'nan')
+                & acodes.astype(bool) & cpartnos.astype(bool)
+            )
+            acodes, cpartnos = acodes[valid], cpartnos[valid]
+            norm_acodes = self.normalize_codes(acodes)
+            norm_cpartnos = self.normalize_codes(cpartnos)
+
+            for acode, cpartno, norm_acode, norm_cpartno in zip(acodes, cpartnos, norm_acodes, norm_cpartnos):
                 # Add bidirectional mappings
                 self.code_mappings[acode].add(cpartno)
                 self.code_mappings[cpartno].add(acode)
-                
+
                 # Add normalized versions of codes
-                norm_acode = self.normalize_code(acode)
-                norm_cpartno = self.normalize_code(cpartno)
                 if norm_acode != acode:
                     self.code_mappings[norm_acode].add(cpartno)
                 if norm_cpartno != cpartno:
@@ -80,108 +177,119 @@ class DocumentProcessor:
             logger.error(f"Error loading ERP codes: {str(e)}")
             raise
 
-    def normalize_code(self, code: str) -> str:
-        """Normalize valve codes by removing common variations"""
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def normalize_code(code: str) -> str:
+        """Normalize valve codes by removing common variations (cached, codes recur heavily)"""
         code = str(code).strip().upper()
         # Remove common prefixes/suffixes and clean spaces
-        code = re.sub(r'\[D\]$', '', code)
-        code = re.sub(r'\s+', ' ', code)
-        code = re.sub(r'MR$', '', code)  # Remove MR suffix
-        code = re.sub(r'^\s*(?:VALVE|CHECK)\s+', '', code)  # Remove common prefixes
+        code = _NORM_D_SUFFIX_RE.sub('', code)
+        code = _WS_RE.sub(' ', code)
+        code = _NORM_MR_SUFFIX_RE.sub('', code)  # Remove MR suffix
+        code = _NORM_PREFIX_RE.sub('', code)  # Remove common prefixes
         return code.strip()
 
-    def extract_text_from_pdf(self, pdf_path: str) -> str:
-        """Extract text from PDF with enhanced preprocessing and error handling"""
+    @staticmethod
+    def normalize_codes(codes: pd.Series) -> pd.Series:
+        """Vectorized normalize_code over a Series of already-stripped codes"""
+        return (codes.str.upper()
+                .str.replace(_NORM_D_SUFFIX_RE, '', regex=True)
+                .str.replace(_WS_RE, ' ', regex=True)
+                .str.replace(_NORM_MR_SUFFIX_RE, '', regex=True)
+                .str.replace(_NORM_PREFIX_RE, '', regex=True)
+                .str.strip())
+
+    def extract_page_texts(self, pdf_path: str) -> Iterator[str]:
+        """Yield the raw text of each PDF page"""
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                yield self.fitz_page_text(page)
+
+    @staticmethod
+    def fitz_page_text(page) -> str:
+        """Rebuild visual lines from PyMuPDF words.
+
+        Plain get_text('text') puts every table cell and span on its own line, which
+        splits codes like 'Marc code: 12603' away from the text they belong to.
+        """
+        words = sorted(page.get_text('words'), key=lambda w: (w[3], w[0]))
+        lines = []
+        current = []
+        baseline = None
+        for word in words:
+            # Words whose bottom edges are within tolerance share a line
+            if current and abs(word[3] - baseline) > _LINE_TOLERANCE:
+                lines.append(current)
+                current = []
+            if not current:
+                baseline = word[3]
+            current.append(word)
+        if current:
+            lines.append(current)
+
+        return '\n'.join(' '.join(w[4] for w in sorted(line, key=lambda w: w[0])) for line in lines)
+
+    def iter_pdf_lines(self, pdf_path: str) -> Iterator[str]:
+        """Yield cleaned, non-empty PDF lines page by page, with error handling"""
         try:
-            reader = PdfReader(pdf_path)
-            pages_text = []
-            
-            for page in reader.pages:
-                text = page.extract_text()
+            for text in self.extract_page_texts(pdf_path):
                 if not text:
                     continue
                     
-                # Enhanced text preprocessing
-                text = re.sub(r'\s+', ' ', text)  # Normalize whitespace
-                text = text.replace('\f', '\n')    # Handle form feeds
-                text = re.sub(r'(?<=[a-zA-Z])(?=\d)', ' ', text)  # Add space between letters and numbers
-                
-                # Split and clean lines
-                lines = [line.strip() for line in text.split('\n')]
-                lines = [line for line in lines if line and not line.isspace()]
-                pages_text.extend(lines)
-            
-            return '\n'.join(pages_text)
+                # Add space between letters and numbers
+                text = _LETNUM_RE.sub(' ', text)
+
+                # splitlines() also breaks on form feeds; whitespace inside a line is
+                # normalized later, where codes are extracted
+                for line in text.splitlines():
+                    if line and not line.isspace():
+                        yield line.strip()
             
         except Exception as e:
             logger.error(f"Error extracting text from {pdf_path}: {e}")
-            return ""
 
-    def extract_codes_from_line(self, line: str) -> Set[str]:
+    def extract_codes_from_line(self, line: str, clean_line: Optional[str] = None) -> Set[str]:
         """Extract valve codes with improved pattern matching"""
         codes = set()
+
+        # Every code pattern contains a digit, so lines without one cannot match
+        if not _DIGIT_RE.search(line):
+            return codes
         
         # Skip lines that are likely headers or footers
-        skip_patterns = [
-            r'(?i)Generated on',
-            r'(?i)Page \d+ of',
-            r'(?i)This is acknowledgement',
-            r'(?i)Made By',
-            r'(?i)TOTAL WEIGHT',
-            r'(?i)Unloading point'
-        ]
-        
-        for pattern in skip_patterns:
-            if re.search(pattern, line):
-                return codes
-
-        # Define specific code patterns
-        patterns = [
-            # Product codes from SO
-            (r'\b9[0-9]{6}\b', 'Product Code'),
-            
-            # DP/DPCV format codes
-            (r'(?:DP|DPCV)\s*\d{4}\s*MM\s*#\d{2,4}\s*M-\d+[A-Z]?', 'DPCV/DP Full Format'),
-            (r'DP\d{2}\.[A-Z0-9]+\.\d{2}\.[A-Z]{2}\.\d+[A-Z]?', 'DP Technical Format'),
-            
-            # CH format codes from PO
-            (r'CH-\d{4}(?:\s+MR)?', 'CH Format'),
-            (r'CH[LHS]?-\d{4}', 'CH-XXXX Format'),
-            
-            # Additional valve codes
-            (r'(?:CHL|CHS)-\d{4}', 'CHL/CHS Format'),
-            
-            # Marc codes
-            (r'(?<=Marc code:\s)\d+', 'Marc Code'),
-            
-            # Standalone valve numbers
-            (r'(?<=Item No\.\s)\d{3,4}(?=\s)', 'Item Number')
-        ]
-        
-        clean_line = ' '.join(line.split())
-        logger.debug(f"Processing line: {clean_line}")
+        if _SKIP_RE.search(line):
+            return codes
+
+        if clean_line is None:
+            clean_line = ' '.join(line.split())
+        if _DEBUG:
+            logger.debug("Processing line: %s", clean_line)
         
-        for pattern, pattern_type in patterns:
-            matches = re.finditer(pattern, clean_line, re.IGNORECASE)
-            for match in matches:
-                code = match.group(0).strip()
-                if code:
-                    # Clean and normalize the code
-                    code = re.sub(r'\s+', ' ', code).upper()
-                    codes.add(code)
-                    
-                    # Generate related codes
-                    if 'CH-' in code:
-                        if num := re.search(r'\d{4}', code):
-                            num = num.group(0)
-                            codes.add(f"DP {num} MM")
-                            codes.add(f"DPCV {num} MM")
-                            
-                    # Extract Marc code if present
-                    if marc_match := re.search(r'Marc code:\s*(\d+)', clean_line):
-                        codes.add(marc_match.group(1))
-                    
-                    logger.debug(f"Found {pattern_type}: {code}")
+        for match in chain(_CODE_RE.finditer(clean_line), _LABELLED_CODE_RE.finditer(clean_line)):
+            code_type = match.lastgroup
+            if code_type == 'ch':
+                series = match.group('ch_series').upper()
+                code = f"CH{series}-{match.group('ch_number')}"
+                codes.add(code)
+
+                # Plain CH codes keep their MR variant and generate related codes
+                if not series:
+                    if match.group('ch_mr'):
+                        codes.add(f"{code} MR")
+                    num = match.group('ch_number')
+                    codes.add(f"DP {num} MM")
+                    codes.add(f"DPCV {num} MM")
+            else:
+                # Clean and normalize the code
+                code = _WS_RE.sub(' ', match.group(code_type)).upper()
+                codes.add(code)
+
+            if _DEBUG:
+                logger.debug("Found %s: %s", _CODE_TYPES[code_type], code)
+
+        # Extract Marc code if present, once per line that has any code
+        if codes and (marc_match := _MARC_RE.search(clean_line)):
+            codes.add(marc_match.group(1))
         
         return codes
 
@@ -189,32 +297,13 @@ class DocumentProcessor:
         """Extract quantity and price with improved pattern matching"""
         quantity = "1"
         price = 0.0
-        
-        # More specific quantity patterns
-        qty_patterns = [
-            r'QTY\s*[:=]?\s*(\d+)',                    # QTY: 123
-            r'Quantity\s*[:=]?\s*(\d+)',               # Quantity: 123
-            r'\s(\d+)\s*(?:NOS|PCS|PIECES|EA|NR)',    # 123 NOS or 123 PCS
-            r'^\s*(\d+)\s*$',                          # Standalone number at start
-            r'Quantity\s+(\d+)\s+UM',                  # From PO format
-            r'(?<=\s)(\d+)(?=\s+(?:NR|EA))',          # Number before NR/EA
-            r'(?<=\s)(\d+)(?=\s+(?:USD|USD\s+))'      # Number before USD
-        ]
-        
-        # More specific price patterns
-        price_patterns = [
-            r'USD\s*([\d,]+(?:\.\d{2})?)',            # USD 123.45
-            r'\$\s*([\d,]+(?:\.\d{2})?)',             # $ 123.45
-            r'(?:Price|PRICE)[:\s]*([\d,]+(?:\.\d{2})?)',  # Price: 123.45
-            r'(?:Unit Price|UNIT PRICE)[:\s]*([\d,]+(?:\.\d{2})?)',  # Unit Price: 123.45
-            r'(?<=\s)([\d,]+\.\d{2})(?=\s+USD)',      # 123.45 USD
-            r'Amount\s+USD\s+([\d,]+\.\d{2})',        # Amount USD 123.45
-            r'(?<=[A-Z])\s+([\d,]+\.\d{2})\s*$'       # Price at end of line after text
-        ]
+        line_upper = line.upper()
         
         # Extract quantity with validation
-        for pattern in qty_patterns:
-            if match := re.search(pattern, line, re.IGNORECASE):
+        for required, pattern in _QTY_PATTERNS:
+            if required and not any(literal in line_upper for literal in required):
+                continue
+            if match := pattern.search(line):
                 try:
                     qty = int(match.group(1))
                     if 0 < qty < 10000:  # reasonable range for valve quantities
@@ -224,8 +313,10 @@ class DocumentProcessor:
                     continue
                 
         # Extract price with validation
-        for pattern in price_patterns:
-            if match := re.search(pattern, line, re.IGNORECASE):
+        for required, pattern in _PRICE_PATTERNS:
+            if required and not any(literal in line_upper for literal in required):
+                continue
+            if match := pattern.search(line):
                 try:
                     price_str = match.group(1).replace(',', '')
                     price_val = float(price_str)
@@ -235,7 +326,8 @@ class DocumentProcessor:
                 except ValueError:
                     continue
         
-        logger.debug(f"Extracted quantity: {quantity}, price: {price} from line: {line}")
+        if _DEBUG:
+            logger.debug("Extracted quantity: %s, price: %s from line: %s", quantity, price, line)
         return quantity, price
 
     def determine_doc_type(self, filename: str, content: str) -> str:
@@ -262,13 +354,15 @@ class DocumentProcessor:
 
     def items_match(self, po_item: ValveItem, so_item: ValveItem) -> bool:
         """Check if PO and SO items match using direct codes and mappings"""
-        logger.debug(f"\nComparing:")
-        logger.debug(f"PO codes: {po_item.item_codes}")
-        logger.debug(f"SO codes: {so_item.item_codes}")
+        if _DEBUG:
+            logger.debug("\nComparing:")
+            logger.debug("PO codes: %s", po_item.item_codes)
+            logger.debug("SO codes: %s", so_item.item_codes)
         
         # Direct code match
         if po_item.item_codes & so_item.item_codes:
-            logger.debug("Direct match found")
+            if _DEBUG:
+                logger.debug("Direct match found")
             return True
             
         # Compare numeric parts for CH/DP codes
@@ -276,40 +370,66 @@ class DocumentProcessor:
         so_numbers = set()
         
         for code in po_item.item_codes:
-            if match := re.search(r'\d{4}', code):
+            if match := _NUM4_RE.search(code):
                 po_numbers.add(match.group(0))
         
         for code in so_item.item_codes:
-            if match := re.search(r'\d{4}', code):
+            if match := _NUM4_RE.search(code):
                 so_numbers.add(match.group(0))
                 
         if po_numbers & so_numbers:
-            logger.debug(f"Numeric match found: {po_numbers & so_numbers}")
+            if _DEBUG:
+                logger.debug("Numeric match found: %s", po_numbers & so_numbers)
             return True
             
-        # Check mapped codes
-        for po_code in po_item.item_codes:
-            mapped_codes = self.code_mappings.get(po_code, set())
-            if mapped_codes & so_item.item_codes:
-                logger.debug(f"Mapped match found: {po_code} -> {mapped_codes & so_item.item_codes}")
-                return True
-                
-            # Try normalized versions
-            norm_po_code = self.normalize_code(po_code)
-            if norm_po_code != po_code:
-                mapped_codes = self.code_mappings.get(norm_po_code, set())
-                if mapped_codes & so_item.item_codes:
-                    logger.debug(f"Normalized match found: {norm_po_code} -> {mapped_codes & so_item.item_codes}")
-                    return True
+        # Check mapped codes, including those of the normalized PO codes
+        if mapped := po_item.mapped_codes & so_item.item_codes:
+            if _DEBUG:
+                logger.debug("Mapped match found: %s", mapped)
+            return True
         
         return False
 
+    def index_so_items(self, so_items: List[ValveItem]) -> tuple[Dict[str, List[int]], Dict[str, List[int]]]:
+        """Build inverted indexes from codes and 4-digit numbers to SO item positions"""
+        so_by_code = defaultdict(list)
+        so_by_num4 = defaultdict(list)
+
+        for idx, so_item in enumerate(so_items):
+            numbers = set()
+            for code in so_item.item_codes:
+                so_by_code[code].append(idx)
+                if match := _NUM4_RE.search(code):
+                    numbers.add(match.group(0))
+            for number in numbers:
+                so_by_num4[number].append(idx)
+
+        return so_by_code, so_by_num4
+
+    def match_candidates(self, po_item: ValveItem, so_by_code: Dict[str, List[int]],
+                         so_by_num4: Dict[str, List[int]]) -> Set[int]:
+        """Positions of the SO items that items_match can accept for a PO item"""
+        candidates = set()
+
+        for po_code in po_item.item_codes:
+            # Direct and numeric matches
+            candidates.update(so_by_code.get(po_code, ()))
+            if match := _NUM4_RE.search(po_code):
+                candidates.update(so_by_num4.get(match.group(0), ()))
+
+        # Mapped and normalized-mapped matches
+        for mapped_code in po_item.mapped_codes:
+            candidates.update(so_by_code.get(mapped_code, ()))
+
+        return candidates
+
     def process_line(self, line: str, doc_type: str) -> Optional[ValveItem]:
         """Process a single line into a ValveItem"""
-        if not line.strip():
+        clean_line = ' '.join(line.split())
+        if not clean_line:
             return None
             
-        codes = self.extract_codes_from_line(line)
+        codes = self.extract_codes_from_line(line, clean_line)
         if not codes:
             return None
             
@@ -317,13 +437,19 @@ class DocumentProcessor:
         
         # Extract material specification
         material_spec = ""
-        if mat_match := re.search(r'\(([^)]+)\)', line):
+        if mat_match := _MAT_RE.search(line):
             material_spec = mat_match.group(1).strip()
             
+        line_match = _LINENO_RE.match(line)
+        mapped_codes = set()
+        for code in codes | {self.normalize_code(code) for code in codes}:
+            mapped_codes.update(self.code_mappings.get(code, ()))
+
         # Create and return valve item
         item = ValveItem(
-            line_number=re.search(r'^\s*(\d+)', line).group(1) if re.search(r'^\s*(\d+)', line) else "",
+            line_number=line_match.group(1) if line_match else "",
             item_codes=codes,
+            mapped_codes=mapped_codes,
             quantity=quantity,
             price=price,
             material_spec=material_spec,
@@ -332,49 +458,62 @@ class DocumentProcessor:
             original_line=line
         )
         
-        logger.debug(f"Created item: {item}")
+        if _DEBUG:
+            logger.debug("Created item: %s", item)
         return item
 
-    def process_pdfs(self):
-        """Process all PDFs in the folder with improved error handling"""
-        processed_files = 0
-        
-        for filename in os.listdir(self.pdf_folder):
-            if not filename.lower().endswith('.pdf'):
-                continue
+    def process_pdf(self, pdf_path: str) -> Optional[List[ValveItem]]:
+        """Extract the unique items of a single PDF, or None if it could not be processed"""
+        filename = os.path.basename(pdf_path)
+        try:
+            logger.info(f"Processing {filename}")
+            lines = self.iter_pdf_lines(pdf_path)
 
-            pdf_path = os.path.join(self.pdf_folder, filename)
-            try:
-                logger.info(f"Processing {filename}")
-                content = self.extract_text_from_pdf(pdf_path)
-                if not content:
-                    logger.warning(f"No content extracted from {filename}")
-                    continue
-                    
-                doc_type = self.determine_doc_type(filename, content)
-                
-                # Process lines and remove duplicates
-                items_found = []
-                for line in content.split('\n'):
-                    if item := self.process_line(line, doc_type):
-                        items_found.append(item)
-                
-                # Remove duplicates while preserving order
-                seen_codes = set()
-                unique_items = []
-                for item in items_found:
-                    codes_tuple = tuple(sorted(item.item_codes))
-                    if codes_tuple and codes_tuple not in seen_codes:
-                        seen_codes.add(codes_tuple)
-                        unique_items.append(item)
+            # Only the first lines are needed to detect the document type
+            head = list(islice(lines, DOC_TYPE_HEAD_LINES))
+            if not head:
+                logger.warning(f"No content extracted from {filename}")
+                return None
                 
-                self.items.extend(unique_items)
+            doc_type = self.determine_doc_type(filename, '\n'.join(head))
+            
+            # Process lines, keeping the first item per code set (dicts preserve order)
+            unique_items = {}
+            for line in chain(head, lines):
+                if item := self.process_line(line, doc_type):
+                    unique_items.setdefault(frozenset(item.item_codes), item)
+            
+            logger.info(f"Processed {filename} ({doc_type}) - Found {len(unique_items)} unique items")
+            return list(unique_items.values())
+            
+        except Exception as e:
+            logger.error(f"Error processing {filename}: {str(e)}")
+            return None
+
+    def process_pdfs(self, max_workers: Optional[int] = None):
+        """Process all PDFs in the folder, one worker process per CPU core"""
+        with os.scandir(self.pdf_folder) as entries:
+            pdf_paths = [
+                entry.path for entry in entries
+                if entry.is_file() and entry.name.lower().endswith('.pdf')
+            ]
+        max_workers = min(max_workers or os.cpu_count() or 1, len(pdf_paths))
+
+        if max_workers <= 1:
+            results = map(self.process_pdf, pdf_paths)
+        else:
+            # Workers receive a copy of the processor (with its ERP code mappings) once,
+            # rather than with every file; map() keeps the results in file order
+            executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                           initargs=(self,))
+            with executor:
+                results = list(executor.map(_process_one, pdf_paths))
+
+        processed_files = 0
+        for items in results:
+            if items is not None:
+                self.items.extend(items)
                 processed_files += 1
-                logger.info(f"Processed {filename} ({doc_type}) - Found {len(unique_items)} unique items")
-                
-            except Exception as e:
-                logger.error(f"Error processing {filename}: {str(e)}")
-                continue
         
         if processed_files == 0:
             logger.warning("No PDF files were successfully processed")
@@ -392,19 +531,25 @@ class DocumentProcessor:
             'unmatched_items': []
         }
 
-        # Count items by document type
+        # Count items by document type and split out PO and SO items in one pass
+        po_items, so_items = [], []
         for item in self.items:
             analysis['doc_summary'][item.source_doc] += 1
+            if item.source_doc == "PO":
+                po_items.append(item)
+            elif item.source_doc == "SO":
+                so_items.append(item)
 
         # Analyze matches between PO and SO items
-        po_items = [item for item in self.items if item.source_doc == "PO"]
-        so_items = [item for item in self.items if item.source_doc == "SO"]
+        so_by_code, so_by_num4 = self.index_so_items(so_items)
 
         for po_item in po_items:
             analysis['total_po_items'] += 1
             found_match = False
-            
-            for so_item in so_items:
+
+            # Only indexed candidates can match; check them in SO order
+            for idx in sorted(self.match_candidates(po_item, so_by_code, so_by_num4)):
+                so_item = so_items[idx]
                 if self.items_match(po_item, so_item):
                     found_match = True
                     analysis['matched_items'] += 1
@@ -484,6 +629,16 @@ class DocumentProcessor:
 
         return "\n".join(report)
 
+# Processor copy used by process_pdfs worker processes
+_worker_processor: Optional[DocumentProcessor] = None
+
+def _init_worker(processor: DocumentProcessor):
+    global _worker_processor
+    _worker_processor = processor
+
+def _process_one(pdf_path: str) -> Optional[List[ValveItem]]:
+    return _worker_processor.process_pdf(pdf_path)
+
 def main():
     """Main execution function with error handling"""
     try:
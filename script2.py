@@ -1,29 +1,93 @@
 import os
 import re
+import json
+import argparse
 import logging
+import atexit
+from collections import defaultdict
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
-from dataclasses import dataclass, field
-from typing import Set, List, Dict, Optional, Tuple
-from fuzzywuzzy import process
+from typing import FrozenSet, NamedTuple, Set, List, Dict, Optional, Tuple
+from rapidfuzz import process, fuzz, utils
 import fitz  # PyMuPDF
 import xlsxwriter
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('process.log'),
-        logging.StreamHandler()
-    ]
-)
+# Handlers installed by configure_logging, and the background thread writing queued records
+_log_handlers: List[logging.Handler] = []
+_log_listener: Optional[QueueListener] = None
+
+def configure_logging(queued: bool = True):
+    """Log to process.log and the console at LOG_LEVEL (default INFO), from a background thread if queued"""
+    global _log_listener
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    handlers = [logging.FileHandler('process.log'), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # Replace only what an earlier call installed, leaving handlers added by a host application
+    root = logging.getLogger()
+    if _log_listener is not None:
+        atexit.unregister(_log_listener.stop)
+        _log_listener.stop()
+        _log_listener = None
+    for handler in _log_handlers:
+        root.removeHandler(handler)
+        handler.close()
+    _log_handlers.clear()
+
+    root.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+    if queued:
+        # QueueHandler.prepare() still merges the message and its arguments in the
+        # logging thread; the listener's handlers add the timestamp and write it out
+        log_queue = queue.SimpleQueue()
+        queue_handler = QueueHandler(log_queue)
+        root.addHandler(queue_handler)
+        _log_handlers.append(queue_handler)
+        _log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _log_listener.start()
+        atexit.register(_log_listener.stop)
+    else:
+        for handler in handlers:
+            root.addHandler(handler)
+    _log_handlers.extend(handlers)
+
 logger = logging.getLogger(__name__)
 
-@dataclass
-class ValveItem:
+# PyMuPDF's default flags for "blocks" text, which already leave out TEXT_PRESERVE_IMAGES;
+# passed explicitly so process_pdf keeps seeing text blocks only if the defaults change
+TEXT_BLOCK_FLAGS = fitz.TEXTFLAGS_BLOCKS
+
+# Number of PO codes up to which fuzzy matching uses per-code extractOne rather than a full cdist matrix
+FUZZY_EXTRACT_LIMIT = 1000
+
+# Highest score reported for a fuzzy match, below exact (100) and MR-stripped (95) matches
+FUZZY_MAX_SCORE = 90
+
+# Valve code formats, in their default order within the fused code pattern
+CODE_PATTERNS = [
+    ('DPCV', r'(?:DP|DPCV)\s*\d{4}\s*MM\s*#\d{2,4}\s*M-\d+[A-Z]?'),
+    ('CH', r'CH-\d{4}(?:\s+MR)?'),
+    ('TECH', r'DP\d{2}\.[A-Z0-9]+\.\d{2}\.[A-Z]{2}\.\d+[A-Z]?'),
+    ('PROD', r'\b9[0-9]{6}\b')
+]
+
+# Every code starts with one of these characters, so lines without any cannot match
+CODE_FIRST_CHARS = 'DdCc9'
+
+# Per-format hit counts written by --profile, used to order the code pattern
+PATTERN_PROFILE = 'patterns.json'
+
+# Code formats by priority when choosing an item's primary code
+CODE_PRIORITY = {code_type: rank for rank, code_type in enumerate(('DPCV', 'CH', 'TECH', 'PROD'))}
+
+class ValveItem(NamedTuple):
     """Represents a valve item with all identifiers and specifications"""
     item_number: str = ""
-    codes: Set[str] = field(default_factory=set)
+    primary_code: str = ""
+    codes: FrozenSet[str] = frozenset()
     marc_code: str = ""
     material_spec: str = ""
     quantity: str = "1"
@@ -39,65 +103,111 @@ class ValveProcessor:
         self.output_dir = output_dir
         self.erp_data = None
         self.items = []
+        self.po_items = []  # self.items partitioned by document type
+        self.so_items = []
         self.analysis_df = None
         
+        # Precompiled patterns, shared by every line of every PDF.
+        self._skip_re = re.compile(r'DOCUSIGN|PAGE|GENERATED', re.IGNORECASE)  # irrelevant lines
+        # The code formats are fused into one alternation with a named group each;
+        # the lookahead lets codes of different formats overlap as separate scans would.
+        # No two formats can match at the same position, so the most frequent ones are
+        # tried first without changing results.
+        hits = self.load_pattern_profile()
+        code_patterns = sorted(CODE_PATTERNS, key=lambda code_pattern: -hits.get(code_pattern[0], 0))
+        self._code_re = re.compile(
+            r'(?=(?:' + '|'.join(f'(?P<{name}>{pattern})' for name, pattern in code_patterns) + r'))',
+            re.IGNORECASE
+        )
+        # Quantity and price patterns, each with the uppercase literals a line must
+        # contain for it to match (None = always try), checked with cheap substring tests
+        self._qty_patterns = [
+            (literals, re.compile(pattern, re.IGNORECASE)) for literals, pattern in (
+                (('QTY',), r'QTY\s*[:=]?\s*(\d+)'),
+                (('QUANTITY',), r'Quantity\s*[:=]?\s*(\d+)'),
+                (('NOS', 'PCS', 'PIECES', 'EA', 'NR'), r'\s(\d+)\s*(?:NOS|PCS|PIECES|EA|NR)'),
+                (None, r'^\s*(\d+)\s*$')
+            )
+        ]
+        self._price_patterns = [
+            (literals, re.compile(pattern, re.IGNORECASE)) for literals, pattern in (
+                (('USD',), r'USD\s*([\d,]+(?:\.\d{2})?)'),
+                (('$',), r'\$\s*([\d,]+(?:\.\d{2})?)'),
+                (('PRICE',), r'(?:Price|PRICE)[:\s]*([\d,]+(?:\.\d{2})?)')
+            )
+        ]
+        self._mat_re = re.compile(r'\(([^)]+)\)')
+        self._marc_re = re.compile(r'Marc code:\s*(\d+)')
+        self._number_re = re.compile(r'\b9\d{6}\b|\d{4}')  # product or 4-digit valve number
+        
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
+    def load_pattern_profile(self) -> Dict[str, int]:
+        """Load per-format code hit counts recorded by a --profile run, if any"""
+        if not os.path.exists(PATTERN_PROFILE):
+            return {}
+        try:
+            with open(PATTERN_PROFILE) as f:
+                profile = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring pattern profile %s: %s", PATTERN_PROFILE, e)
+            return {}
+        if not isinstance(profile, dict) or not all(
+            isinstance(count, int) and not isinstance(count, bool) for count in profile.values()
+        ):
+            logger.warning("Ignoring pattern profile %s: expected an object of integer counts", PATTERN_PROFILE)
+            return {}
+        return profile
+
+    def save_pattern_profile(self):
+        """Record how often each code format occurs in the extracted items"""
+        hits = {name: 0 for name, _ in CODE_PATTERNS}
+        for item in self.items:
+            for match in self._code_re.finditer(item.original_line):
+                hits[match.lastgroup] += 1
+        with open(PATTERN_PROFILE, 'w') as f:
+            json.dump(hits, f, indent=2)
+        logger.info("Saved code pattern hit counts to %s: %s", PATTERN_PROFILE, hits)
+
     def load_erp_codes(self):
         """Load ERP codes from Excel file"""
         try:
             self.erp_data = pd.read_excel(self.excel_path)
-            logger.info(f"Loaded {len(self.erp_data)} ERP codes")
+            logger.info("Loaded %d ERP codes", len(self.erp_data))
         except Exception as e:
-            logger.error(f"Error loading Excel file: {str(e)}")
+            logger.error("Error loading Excel file: %s", e)
             raise
 
-    def extract_codes_from_line(self, line: str) -> Set[str]:
-        """Extract valve codes from a line using configured patterns"""
+    def extract_codes_from_line(self, line: str) -> Tuple[str, FrozenSet[str]]:
+        """Extract the primary code and all valve codes from a line using configured patterns"""
+        # Skip lines that cannot hold a code, or are irrelevant
+        if not any(char in line for char in CODE_FIRST_CHARS) or self._skip_re.search(line):
+            return "", frozenset()
+
         codes = set()
+        primary_code, primary_rank = "", len(CODE_PRIORITY)
+        for match in self._code_re.finditer(line):
+            code = match.group(match.lastgroup).strip().upper()
+            codes.add(code)
+            
+            # The first code of the highest priority format is the primary one
+            if (rank := CODE_PRIORITY[match.lastgroup]) < primary_rank:
+                primary_code, primary_rank = code, rank
         
-        # Skip irrelevant lines
-        if any(x in line.upper() for x in ['DOCUSIGN', 'PAGE', 'GENERATED']):
-            return codes
-
-        patterns = [
-            (r'(?:DP|DPCV)\s*\d{4}\s*MM\s*#\d{2,4}\s*M-\d+[A-Z]?', 'DPCV/DP'),
-            (r'CH-\d{4}(?:\s+MR)?', 'CH'),
-            (r'DP\d{2}\.[A-Z0-9]+\.\d{2}\.[A-Z]{2}\.\d+[A-Z]?', 'Technical'),
-            (r'\b9[0-9]{6}\b', 'Product')
-        ]
-        
-        for pattern, code_type in patterns:
-            if matches := re.finditer(pattern, line, re.IGNORECASE):
-                for match in matches:
-                    codes.add(match.group(0).strip().upper())
-        
-        return codes
+        return primary_code, frozenset(codes)
 
     def extract_quantity_and_price(self, line: str) -> Tuple[str, float]:
         """Extract quantity and price from line"""
         quantity = "1"
         price = 0.0
-        
-        # Quantity patterns
-        qty_patterns = [
-            r'QTY\s*[:=]?\s*(\d+)',
-            r'Quantity\s*[:=]?\s*(\d+)',
-            r'\s(\d+)\s*(?:NOS|PCS|PIECES|EA|NR)',
-            r'^\s*(\d+)\s*$'
-        ]
-        
-        # Price patterns
-        price_patterns = [
-            r'USD\s*([\d,]+(?:\.\d{2})?)',
-            r'\$\s*([\d,]+(?:\.\d{2})?)',
-            r'(?:Price|PRICE)[:\s]*([\d,]+(?:\.\d{2})?)'
-        ]
+        line_upper = line.upper()
         
         # Extract quantity
-        for pattern in qty_patterns:
-            if match := re.search(pattern, line, re.IGNORECASE):
+        for literals, pattern in self._qty_patterns:
+            if literals and not any(literal in line_upper for literal in literals):
+                continue
+            if match := pattern.search(line):
                 try:
                     qty = int(match.group(1))
                     if 0 < qty < 10000:  # reasonable range
@@ -107,8 +217,10 @@ class ValveProcessor:
                     continue
         
         # Extract price
-        for pattern in price_patterns:
-            if match := re.search(pattern, line, re.IGNORECASE):
+        for literals, pattern in self._price_patterns:
+            if literals and not any(literal in line_upper for literal in literals):
+                continue
+            if match := pattern.search(line):
                 try:
                     price_str = match.group(1).replace(',', '')
                     price = float(price_str)
@@ -121,18 +233,15 @@ class ValveProcessor:
 
     def extract_material_spec(self, line: str) -> str:
         """Extract material specification from line"""
-        if mat_match := re.search(r'\(([^)]+)\)', line):
+        if mat_match := self._mat_re.search(line):
             spec = mat_match.group(1).strip()
             if any(x in spec.upper() for x in ['ASTM', 'GR.', 'WCB', 'LCC', 'CF8M']):
                 return spec
         return ""
 
     def process_line(self, line: str, doc_type: str) -> Optional[ValveItem]:
-        """Process a single line into a ValveItem"""
-        if not line.strip():
-            return None
-            
-        codes = self.extract_codes_from_line(line)
+        """Process a single stripped, non-empty line into a ValveItem"""
+        primary_code, codes = self.extract_codes_from_line(line)
         if not codes:
             return None
         
@@ -140,10 +249,11 @@ class ValveProcessor:
         material_spec = self.extract_material_spec(line)
             
         marc_code = ""
-        if marc_match := re.search(r'Marc code:\s*(\d+)', line):
+        if marc_match := self._marc_re.search(line):
             marc_code = marc_match.group(1)
         
         return ValveItem(
+            primary_code=primary_code,
             codes=codes,
             marc_code=marc_code,
             material_spec=material_spec,
@@ -163,77 +273,170 @@ class ValveProcessor:
             
             with fitz.open(pdf_path) as doc:
                 for page in doc:
-                    text = page.get_text()
-                    for line in text.split('\n'):
-                        if item := self.process_line(line.strip(), doc_type):
-                            items.append(item)
+                    # Text blocks skip the plain-text layout pass; no image blocks with these flags
+                    for block in page.get_text("blocks", flags=TEXT_BLOCK_FLAGS):
+                        for raw_line in block[4].split('\n'):
+                            line = raw_line.strip()
+                            if not line:
+                                continue
+                            if item := self.process_line(line, doc_type):
+                                items.append(item)
                             
-            logger.info(f"Extracted {len(items)} items from {pdf_path}")
+            logger.info("Extracted %d items from %s", len(items), pdf_path)
             return items
             
         except Exception as e:
-            logger.error(f"Error processing PDF {pdf_path}: {str(e)}")
+            logger.error("Error processing PDF %s: %s", pdf_path, e)
             return []
 
-    def match_items(self, po_item: ValveItem, so_items: List[ValveItem]) -> Tuple[Optional[ValveItem], float]:
-        """Match PO item to SO items"""
-        for so_item in so_items:
-            # Direct code match
-            if po_item.codes & so_item.codes:
-                return so_item, 100
-            
-            # Fuzzy match
-            po_codes = list(po_item.codes)
-            so_codes = list(so_item.codes)
-            
-            for po_code in po_codes:
-                for so_code in so_codes:
-                    if 'MR' in po_code:
-                        po_code_clean = po_code.replace(' MR', '')
-                        if po_code_clean == so_code:
-                            return so_item, 95
+    def index_so_codes(self, so_items: List[ValveItem]) -> Tuple[pd.Index, np.ndarray]:
+        """Factorize SO codes into unique codes and the position of the first SO item carrying each"""
+        codes = pd.Index([code for item in so_items for code in item.codes], dtype=object)
+        positions = np.repeat(np.arange(len(so_items)),
+                              np.array([len(item.codes) for item in so_items], dtype=np.intp))
         
-        return None, 0
+        # Codes are flattened in SO order, so a code's first occurrence is its earliest item
+        first = ~codes.duplicated()
+        # The trailing position (one past the last SO item) is what unknown codes (-1) map to
+        return codes[first], np.append(positions[first], len(so_items))
+
+    def match_indices(self, po_items: List[ValveItem], code_index: pd.Index,
+                      first_so: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Position of the first SO item sharing a code with each PO item (-1 if none) and its score"""
+        if not po_items:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.int16)
+        
+        po_codes = [code for item in po_items for code in item.codes]
+        po_starts = np.cumsum([0] + [len(item.codes) for item in po_items[:-1]])
+        
+        # Direct code matches, and matches without the MR suffix, probed in one hash join each
+        direct = first_so[code_index.get_indexer(po_codes)]
+        stripped = first_so[code_index.get_indexer(
+            [code.replace(' MR', '') if 'MR' in code else None for code in po_codes]
+        )]
+        
+        # The earliest SO item wins per PO item, preferring a direct match on the same item
+        best = np.minimum.reduceat(np.minimum(direct * 2, stripped * 2 + 1), po_starts)
+        matched_idx = best // 2
+        scores = np.where(best % 2 == 0, 100, 95).astype(np.int16)
+        
+        unmatched = matched_idx == first_so[-1]
+        matched_idx[unmatched] = -1
+        scores[unmatched] = 0
+        return matched_idx, scores
+
+    def factorize_columns(self, po_values: List, so_values: List) -> Tuple[np.ndarray, np.ndarray]:
+        """Integer ids for PO and SO values, equal ids for equal values; the SO ids end with a -1 placeholder"""
+        ids, _ = pd.factorize(np.array(po_values + so_values, dtype=object))
+        return ids[:len(po_values)], np.append(ids[len(po_values):], -1)
+
+    def code_numbers(self, codes: FrozenSet[str]) -> Set[str]:
+        """Product numbers and first 4-digit numbers of codes, which fuzzy matches must agree on"""
+        return {match.group(0) for code in codes if (match := self._number_re.search(code))}
+
+    def fuzzy_matches(self, po_items: List[ValveItem], so_items: List[ValveItem]) -> List[Tuple[int, float]]:
+        """Best fuzzy-matching SO position and score for each PO item, (-1, 0) below the match threshold"""
+        if not po_items or not so_items:
+            return [(-1, 0.0)] * len(po_items)
+
+        # Only SO items sharing a valve or product number are candidates, so that
+        # near-identical tags such as CH-1022 and CH-1023 are never taken as matches
+        so_by_number = defaultdict(list)
+        for idx, so_item in enumerate(so_items):
+            for number in self.code_numbers(so_item.codes):
+                so_by_number[number].append(idx)
+        candidates = [
+            sorted({idx for number in self.code_numbers(item.codes) for idx in so_by_number.get(number, ())})
+            for item in po_items
+        ]
+
+        # Flatten the SO codes, normalized once (lowercase, punctuation to spaces);
+        # each item's codes are contiguous, starting at its offset
+        po_codes = [[utils.default_process(code) for code in item.codes] for item in po_items]
+        so_codes = [utils.default_process(code) for item in so_items for code in item.codes]
+        so_counts = np.array([len(item.codes) for item in so_items], dtype=np.intp)
+        so_starts = np.cumsum(np.append(0, so_counts[:-1]))
+
+        # Few PO codes: extractOne per code over its candidates prunes those below the best score so far
+        if sum(map(len, po_codes)) <= FUZZY_EXTRACT_LIMIT:
+            matches = []
+            for codes, so_candidates in zip(po_codes, candidates):
+                choices, owners = [], []
+                for idx in so_candidates:
+                    start = so_starts[idx]
+                    choices.extend(so_codes[start:start + so_counts[idx]])
+                    owners.extend([idx] * so_counts[idx])
+                best_idx, best_score = -1, 0.0
+                for code in codes if choices else ():
+                    if match := process.extractOne(code, choices, scorer=fuzz.token_set_ratio,
+                                                   processor=None, score_cutoff=80):
+                        idx, score = owners[match[2]], match[1]
+                        # The earliest SO item wins among equal scores
+                        if score > best_score or (score == best_score and idx < best_idx):
+                            best_idx, best_score = idx, score
+                matches.append((best_idx, best_score))
+            return matches
+
+        # Many PO codes: one vectorized call scores every PO code against every SO code
+        po_starts = np.cumsum([0] + [len(codes) for codes in po_codes[:-1]])
+        scores = process.cdist([code for codes in po_codes for code in codes], so_codes,
+                               scorer=fuzz.token_set_ratio, processor=None, score_cutoff=80, workers=-1)
+
+        # Reduce code scores to item scores, keeping only the candidate pairs
+        scores = np.maximum.reduceat(scores, po_starts, axis=0)
+        scores = np.maximum.reduceat(scores, so_starts, axis=1)
+        candidate_mask = np.zeros(scores.shape, dtype=bool)
+        for i, so_candidates in enumerate(candidates):
+            candidate_mask[i, so_candidates] = True
+        scores[~candidate_mask] = 0
+        best = scores.argmax(axis=1)
+        return [(int(j), float(scores[i, j])) if scores[i, j] > 0 else (-1, 0.0) for i, j in enumerate(best)]
 
     def analyze_matches(self) -> pd.DataFrame:
         """Analyze matches between PO and SO items"""
-        analysis = {
-            'po_items': [],
-            'so_matches': [],
-            'match_scores': [],
-            'quantity_matches': [],
-            'price_matches': [],
-            'material_matches': []
-        }
+        po_items, so_items = self.po_items, self.so_items
         
-        po_items = [item for item in self.items if item.doc_type == "PO"]
-        so_items = [item for item in self.items if item.doc_type == "SO"]
+        code_index, first_so = self.index_so_codes(so_items)
         
-        for po_item in po_items:
-            matched_item, score = self.match_items(po_item, so_items)
-            
-            analysis['po_items'].append(next(iter(po_item.codes)))
-            analysis['match_scores'].append(score)
-            
-            if matched_item:
-                analysis['so_matches'].append(next(iter(matched_item.codes)))
-                analysis['quantity_matches'].append(po_item.quantity == matched_item.quantity)
-                analysis['price_matches'].append(abs(po_item.price - matched_item.price) < 0.01)
-                analysis['material_matches'].append(po_item.material_spec == matched_item.material_spec)
-            else:
-                analysis['so_matches'].append("No Match")
-                analysis['quantity_matches'].append(False)
-                analysis['price_matches'].append(False)
-                analysis['material_matches'].append(False)
-                
-        return pd.DataFrame(analysis)
+        # Position of each PO item's matched SO item, -1 for no match
+        matched_idx, match_scores = self.match_indices(po_items, code_index, first_so)
+        
+        # Fall back to the best fuzzy match for unmatched codes that differ slightly
+        unmatched = np.flatnonzero(matched_idx < 0)
+        fuzzy = self.fuzzy_matches([po_items[i] for i in unmatched], so_items)
+        for i, (j, score) in zip(unmatched, fuzzy):
+            if j >= 0:
+                matched_idx[i] = j
+                # Truncated, which keeps it at or above the cutoff, and capped below exact matches
+                match_scores[i] = min(int(score), FUZZY_MAX_SCORE)
+        
+        # Compare attributes column-wise as factorized ids; the SO columns end with a
+        # placeholder so that -1 indexes a valid row, which the matched mask then discards
+        matched = matched_idx >= 0
+        po_qty, so_qty = self.factorize_columns([item.quantity for item in po_items],
+                                                [item.quantity for item in so_items])
+        po_mat, so_mat = self.factorize_columns([item.material_spec for item in po_items],
+                                                [item.material_spec for item in so_items])
+        po_price = np.array([item.price for item in po_items], dtype=np.float64)
+        so_price = np.array([item.price for item in so_items] + [np.nan], dtype=np.float64)
+        
+        # Columns are passed as typed arrays, so pandas neither infers nor copies them
+        return pd.DataFrame({
+            'po_items': np.array([item.primary_code for item in po_items], dtype=object),
+            'so_matches': np.array([so_items[idx].primary_code if idx >= 0 else "No Match"
+                                    for idx in matched_idx], dtype=object),
+            'match_scores': match_scores,
+            'quantity_matches': matched & (po_qty == so_qty[matched_idx]),
+            'price_matches': matched & (np.abs(po_price - so_price[matched_idx]) < 0.01),
+            'material_matches': matched & (po_mat == so_mat[matched_idx])
+        }, copy=False)
 
     def generate_insights(self) -> List[Dict]:
         """Generate insights from analysis"""
         insights = []
         
         # Match rate analysis
-        match_rate = len([s for s in self.analysis_df['match_scores'] if s >= 80]) / len(self.analysis_df) * 100
+        match_rate = int((self.analysis_df['match_scores'].values >= 80).sum()) / len(self.analysis_df) * 100
         if match_rate < 95:
             insights.append({
                 'Category': 'Matching',
@@ -242,7 +445,7 @@ class ValveProcessor:
             })
         
         # MR suffix analysis
-        mr_items = len([x for x in self.analysis_df['po_items'] if 'MR' in str(x)])
+        mr_items = int(self.analysis_df['po_items'].astype(str).str.contains('MR', regex=False).sum())
         if mr_items > 0:
             insights.append({
                 'Category': 'Code Patterns',
@@ -251,7 +454,7 @@ class ValveProcessor:
             })
         
         # Discrepancy analysis
-        qty_mismatches = len([q for q in self.analysis_df['quantity_matches'] if not q])
+        qty_mismatches = int((~self.analysis_df['quantity_matches'].values).sum())
         if qty_mismatches > 0:
             insights.append({
                 'Category': 'Quantities',
@@ -261,45 +464,53 @@ class ValveProcessor:
         
         return insights
 
+    def write_sheet(self, workbook: xlsxwriter.Workbook, name: str, columns: List[str], rows):
+        """Write a header row and data rows to a new worksheet"""
+        worksheet = workbook.add_worksheet(name)
+        worksheet.write_row(0, 0, columns)
+        for row_num, row in enumerate(rows, start=1):
+            worksheet.write_row(row_num, 0, row)
+
     def generate_excel_report(self):
         """Generate Excel report with multiple sheets"""
         excel_path = os.path.join(self.output_dir, 'valve_analysis_report.xlsx')
         
-        with pd.ExcelWriter(excel_path, engine='xlsxwriter') as writer:
-            workbook = writer.book
-            
+        # Rows are streamed to disk in order, so the workbook is written without pandas
+        with xlsxwriter.Workbook(excel_path, {'constant_memory': True, 'strings_to_urls': False}) as workbook:
             # Summary sheet
-            summary_data = {
-                'Metric': [
-                    'Total PO Items',
-                    'Total SO Items',
-                    'Matched Items',
-                    'Unmatched Items',
-                    'Quantity Mismatches',
-                    'Material Spec Mismatches'
-                ],
-                'Value': [
-                    len([i for i in self.items if i.doc_type == "PO"]),
-                    len([i for i in self.items if i.doc_type == "SO"]),
-                    len([s for s in self.analysis_df['match_scores'] if s >= 80]),
-                    len([s for s in self.analysis_df['match_scores'] if s < 80]),
-                    len([q for q in self.analysis_df['quantity_matches'] if not q]),
-                    len([m for m in self.analysis_df['material_matches'] if not m])
-                ]
-            }
+            scores = self.analysis_df['match_scores'].values
+            matched = int((scores >= 80).sum())
+            summary_rows = [
+                ('Total PO Items', len(self.po_items)),
+                ('Total SO Items', len(self.so_items)),
+                ('Matched Items', matched),
+                ('Unmatched Items', len(scores) - matched),
+                ('Quantity Mismatches', int((~self.analysis_df['quantity_matches'].values).sum())),
+                ('Material Spec Mismatches', int((~self.analysis_df['material_matches'].values).sum()))
+            ]
+            self.write_sheet(workbook, 'Summary', ['Metric', 'Value'], summary_rows)
             
-            pd.DataFrame(summary_data).to_excel(writer, sheet_name='Summary', index=False)
-            
-            # Matching details sheet
-            self.analysis_df.to_excel(writer, sheet_name='Matching Details', index=False)
+            # Matching details sheet, written from the analysis columns as Python values
+            columns = list(self.analysis_df.columns)
+            details = list(zip(*(self.analysis_df[column].tolist() for column in columns)))
+            self.write_sheet(workbook, 'Matching Details', columns, details)
             
             # Insights sheet
-            pd.DataFrame(self.generate_insights()).to_excel(writer, sheet_name='Insights', index=False)
+            insights = self.generate_insights()
+            insight_columns = list(insights[0]) if insights else []
+            self.write_sheet(workbook, 'Insights', insight_columns,
+                             (tuple(insight.values()) for insight in insights))
             
             # Unmatched items
-            unmatched = self.analysis_df[self.analysis_df['match_scores'] < 80]
-            if not unmatched.empty:
-                unmatched.to_excel(writer, sheet_name='Unmatched Items', index=False)
+            unmatched = [row for row, score in zip(details, scores) if score < 80]
+            if unmatched:
+                self.write_sheet(workbook, 'Unmatched Items', columns, unmatched)
+
+    def add_items(self, items: List[ValveItem]):
+        """Store the items of one PDF, which all share its document type"""
+        if items:
+            self.items.extend(items)
+            (self.po_items if items[0].doc_type == "PO" else self.so_items).extend(items)
 
     def process_all(self):
         """Process all files and generate report"""
@@ -307,12 +518,23 @@ class ValveProcessor:
             # Load ERP data
             self.load_erp_codes()
             
-            # Process PDFs
-            for filename in os.listdir(self.pdf_folder):
-                if filename.endswith('.pdf'):
-                    pdf_path = os.path.join(self.pdf_folder, filename)
-                    items = self.process_pdf(pdf_path)
-                    self.items.extend(items)
+            # Process PDFs, in parallel across files when there are several
+            pdf_paths = [
+                os.path.join(self.pdf_folder, filename)
+                for filename in os.listdir(self.pdf_folder)
+                if filename.endswith('.pdf')
+            ]
+            workers = min(os.cpu_count() or 1, len(pdf_paths))
+            if workers > 1:
+                # Batch files only when there are many per worker, so small folders still spread out
+                chunksize = max(1, len(pdf_paths) // (workers * 4))
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                         initargs=(self.pdf_folder, self.excel_path, self.output_dir)) as executor:
+                    for items in executor.map(_process_pdf, pdf_paths, chunksize=chunksize):
+                        self.add_items(items)
+            else:
+                for pdf_path in pdf_paths:
+                    self.add_items(self.process_pdf(pdf_path))
             
             # Generate analysis and report
             if self.items:
@@ -322,11 +544,29 @@ class ValveProcessor:
                 return True
                 
         except Exception as e:
-            logger.error(f"Error in processing: {str(e)}")
+            logger.error("Error in processing: %s", e)
             raise
 
+# Per-process ValveProcessor used by process_all worker processes
+_worker_processor: Optional[ValveProcessor] = None
+
+def _init_worker(pdf_folder: str, excel_path: str, output_dir: str):
+    global _worker_processor
+    # The parent's listener thread does not exist here, so workers log directly
+    configure_logging(queued=False)
+    _worker_processor = ValveProcessor(pdf_folder, excel_path, output_dir)
+
+def _process_pdf(pdf_path: str) -> List[ValveItem]:
+    return _worker_processor.process_pdf(pdf_path)
+
 def main():
     """Main execution function"""
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Match valve items between PO and SO documents")
+    parser.add_argument('--profile', action='store_true',
+                        help=f"record code pattern hit counts to {PATTERN_PROFILE} to order later runs")
+    args = parser.parse_args()
+    
     processor = ValveProcessor(
         pdf_folder="pdf_folder",
         excel_path="erp_codes.xlsx",
@@ -335,6 +575,8 @@ def main():
     
     try:
         processor.process_all()
+        if args.profile:
+            processor.save_pattern_profile()
         print("Processing completed successfully. Check output directory for results.")
     except Exception as e:
         print("Processing failed. Check process.log for details.")
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from script import DocumentProcessor
+
+
+@pytest.fixture
+def processor(tmp_path):
+    pdf_folder = tmp_path / "pdf_folder"
+    pdf_folder.mkdir()
+    excel_path = tmp_path / "erp_codes.xlsx"
+    pd.DataFrame({
+        'acode': ['9010', '9105', '90370027', '9044', '9300'],
+        'cpartno': ['02) FINISHED VALVES', '02) FINISHED VALVES', '-', '-', '9001234'],
+    }).to_excel(excel_path, index=False)
+    return DocumentProcessor(str(pdf_folder), str(excel_path))
+
+
+def match(processor, po_line, so_line):
+    po_item = processor.process_line(po_line, "PO")
+    so_item = processor.process_line(so_line, "SO")
+    return processor.items_match(po_item, so_item)
+
+
+def test_mapped_codes_match(processor):
+    assert match(processor, "Item No. 9300 valve", "9001234 valve")
+
+
+@pytest.mark.parametrize("po_line, so_line", [
+    ("Item No. 9010 valve", "Item No. 9105 valve"),
+    ("Marc code: 90370027 valve", "Marc code: 9044 valve"),
+])
+def test_shared_cpartno_does_not_join_acodes(processor, po_line, so_line):
+    assert not match(processor, po_line, so_line)